@@ -1,6 +1,6 @@
 from flask import Flask, request, jsonify
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
 
 app = Flask(__name__, static_url_path='', static_folder='.')
@@ -12,6 +12,13 @@ DB_FILE = 'attendance.db'
 # This determines the mode the Pi should be in.
 CURRENT_MODE = "idle" 
 
+# Names given to cards auto-saved in enroll mode, e.g. "Unknown Card 1234"
+PLACEHOLDER_PREFIX = "Unknown Card"
+
+# Paging limits for /api/users/search
+SEARCH_DEFAULT_LIMIT = 50
+SEARCH_MAX_LIMIT = 200
+
 # --- DATABASE SETUP ---
 def init_db():
     conn = sqlite3.connect(DB_FILE)
@@ -27,9 +34,50 @@ def init_db():
                   check_in TEXT, 
                   check_out TEXT, 
                   duration TEXT)''')
+
+    # Search columns for users (added to older databases in place)
+    columns = [row[1] for row in c.execute("PRAGMA table_info(users)")]
+    if 'name_key' not in columns:
+        c.execute("ALTER TABLE users ADD COLUMN name_key TEXT")
+        c.execute("ALTER TABLE users ADD COLUMN placeholder INTEGER DEFAULT 0")
+        rows = c.execute("SELECT card_id, name FROM users").fetchall()
+        for card_id, name in rows:
+            c.execute("UPDATE users SET name_key = ?, placeholder = ? WHERE card_id = ?",
+                      (name_key(name), is_placeholder(name), card_id))
+
+    # Indexes: name prefix search, unknown-first listing, open session per card
+    c.execute("CREATE INDEX IF NOT EXISTS idx_users_name_key ON users (name_key)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_users_placeholder ON users (placeholder DESC, name_key)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_attendance_open ON attendance (card_id, check_out)")
     conn.commit()
     conn.close()
 
+# --- HELPERS: Name search keys ---
+def name_key(name):
+    """Normalized form of a name, used for prefix search and sorting."""
+    return " ".join((name or "").split()).lower()
+
+def is_placeholder(name):
+    """1 if the name is an auto-generated 'Unknown Card' placeholder, else 0."""
+    return 1 if (name or "").startswith(PLACEHOLDER_PREFIX) else 0
+
+def prefix_range(prefix):
+    """Returns (low, high) so that low <= value <= high matches the prefix.
+    Plain comparisons let SQLite walk an index instead of scanning the table.
+    U+10FFFF sorts after every other character, so the bound never overflows."""
+    return prefix, prefix + '\U0010ffff'
+
+# --- HELPERS: Timestamps ---
+def parse_timestamp(value):
+    """Parses 'YYYY-MM-DD HH:MM:SS', with optional fraction (the Pi sends milliseconds)."""
+    if '.' in value:
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S.%f")
+    return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+
+def format_duration(delta):
+    """Duration as H:MM:SS, dropping the sub-second part for display."""
+    return str(delta - timedelta(microseconds=delta.microseconds))
+
 # --- HELPER: Get active session ---
 def get_active_session(card_id):
     """Finds if a user has checked in but not checked out."""
@@ -59,7 +107,8 @@ def enroll_user():
     
     try:
         # Try to insert new user
-        c.execute("INSERT INTO users (card_id, name) VALUES (?, ?)", (card_id, name))
+        c.execute("INSERT INTO users (card_id, name, name_key, placeholder) VALUES (?, ?, ?, ?)",
+                  (card_id, name, name_key(name), is_placeholder(name)))
         conn.commit()
         msg = f"Successfully enrolled {name}"
         status = "success"
@@ -97,9 +146,10 @@ def scan_card():
     
     if not user:
         if CURRENT_MODE == 'enroll':
-            placeholder_name = f"Unknown Card {card_id[-4:]}" # Use last 4 digits
+            placeholder_name = f"{PLACEHOLDER_PREFIX} {card_id[-4:]}" # Use last 4 digits
             try:
-                c.execute("INSERT INTO users (card_id, name) VALUES (?, ?)", (card_id, placeholder_name))
+                c.execute("INSERT INTO users (card_id, name, name_key, placeholder) VALUES (?, ?, ?, 1)",
+                          (card_id, placeholder_name, name_key(placeholder_name)))
                 conn.commit()
                 conn.close()
                 # Return 'enrolled' status so Client knows to beep successfully
@@ -138,9 +188,9 @@ def scan_card():
             return jsonify({"status": "error", "message": f"Cannot check out: {name} never checked in!"})
         
         session_id, check_in_time = active_session
-        t1 = datetime.strptime(check_in_time, "%Y-%m-%d %H:%M:%S")
-        t2 = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
-        duration = str(t2 - t1)
+        t1 = parse_timestamp(check_in_time)
+        t2 = parse_timestamp(timestamp)
+        duration = format_duration(t2 - t1)
 
         c.execute("UPDATE attendance SET check_out = ?, duration = ? WHERE id = ?", (timestamp, duration, session_id))
         conn.commit()
@@ -153,8 +203,8 @@ def scan_card():
             session_id, check_in_time = active_session
             
             # Anti-Bounce Check
-            t_in = datetime.strptime(check_in_time, "%Y-%m-%d %H:%M:%S")
-            t_now = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
+            t_in = parse_timestamp(check_in_time)
+            t_now = parse_timestamp(timestamp)
             diff_minutes = (t_now - t_in).total_seconds() / 60
             
             if diff_minutes < MINUTES_BEFORE_CHECKOUT:
@@ -166,7 +216,7 @@ def scan_card():
                 })
             
             # Valid Checkout
-            duration = str(t_now - t_in)
+            duration = format_duration(t_now - t_in)
             c.execute('''UPDATE attendance SET check_out = ?, duration = ? 
                          WHERE id = ?''', (timestamp, duration, session_id))
             conn.commit()
@@ -230,6 +280,69 @@ def get_users():
         })
     return jsonify(users_list)
 
+# --- API ROUTE 4b: SEARCH USERS (Paged, for large rosters) ---
+@app.route('/api/users/search', methods=['GET'])
+def search_users():
+    """
+    Query params:
+      q       - start of the name (any case) or of the card ID
+      unknown - '1' to only return 'Unknown Card' placeholders
+      limit   - page size (default 50, max 200)
+      offset  - rows to skip
+    Unknown cards come first, then everyone else by name.
+    """
+    raw_q = request.args.get('q', '').strip()
+    unknown_only = request.args.get('unknown', '0') in ('1', 'true')
+    try:
+        limit = int(request.args.get('limit', SEARCH_DEFAULT_LIMIT))
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({"status": "error", "message": "limit and offset must be numbers"}), 400
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    offset = max(0, offset)
+
+    conditions = []
+    params = []
+    if raw_q:
+        name_low, name_high = prefix_range(name_key(raw_q))
+        card_low, card_high = prefix_range(raw_q)
+        conditions.append('''((u.name_key >= ? AND u.name_key <= ?)
+                              OR (u.card_id >= ? AND u.card_id <= ?))''')
+        params += [name_low, name_high, card_low, card_high]
+    if unknown_only:
+        conditions.append("u.placeholder = 1")
+
+    query = '''
+        SELECT u.card_id, u.name,
+        (SELECT check_in FROM attendance a WHERE a.card_id = u.card_id AND a.check_out IS NULL) as status
+        FROM users u
+    '''
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    # Ask for one extra row to know if another page exists
+    query += " ORDER BY u.placeholder DESC, u.name_key LIMIT ? OFFSET ?"
+    params += [limit + 1, offset]
+
+    conn = sqlite3.connect(DB_FILE)
+    c = conn.cursor()
+    c.execute(query, params)
+    rows = c.fetchall()
+    conn.close()
+
+    users_list = []
+    for r in rows[:limit]:
+        users_list.append({
+            "card_id": r[0],
+            "name": r[1],
+            "active_checkin": r[2]
+        })
+    return jsonify({
+        "users": users_list,
+        "offset": offset,
+        "limit": limit,
+        "has_more": len(rows) > limit
+    })
+
 # --- API ROUTE 5: GET/SET DEVICE MODE ---
 @app.route('/api/mode', methods=['GET', 'POST'])
 def handle_mode():
@@ -255,7 +368,8 @@ def rename_user():
     
     conn = sqlite3.connect(DB_FILE)
     c = conn.cursor()
-    c.execute("UPDATE users SET name = ? WHERE card_id = ?", (new_name, card_id))
+    c.execute("UPDATE users SET name = ?, name_key = ?, placeholder = ? WHERE card_id = ?",
+              (new_name, name_key(new_name), is_placeholder(new_name), card_id))
     conn.commit()
     conn.close()
     
@@ -1,11 +1,10 @@
 import time
-from datetime import datetime
 import RPi.GPIO as GPIO
 from mfrc522 import SimpleMFRC522
 import threading
 import queue
-import smbus2
 import requests  # NEW: Library to talk to the backend
+from rtc_clock import RTCClock
 
 # ==========================================
 #               CONFIGURATION
@@ -16,6 +15,7 @@ SERVER_URL = "http://192.168.137.93:5000"
 BUZZER_PIN = 29
 I2C_BUS = 1
 DS3231_ADDRESS = 0x68
+RTC_SYNC_INTERVAL = 600  # Seconds between RTC reads (drift is measured at each)
 
 # Ultrasonic pins
 ULTRASONIC_TRIG = 31
@@ -31,7 +31,6 @@ SERVER_MODE = "idle"
 CURRENT_DISTANCE = 999.0
 LAST_SCANNED_ID = None
 LAST_SCANNED_TEXT = None
-CURRENT_RTC_TIME = datetime.now()
 
 RFID_ENABLED = False
 PREVIOUS_CARD_ID = None
@@ -39,6 +38,7 @@ PREVIOUS_CARD_ID = None
 STOP_THREADS = False
 data_lock = threading.Lock()
 buzzer_queue = queue.Queue()
+rtc_clock = RTCClock(I2C_BUS, DS3231_ADDRESS, RTC_SYNC_INTERVAL)
 
 # ==========================================
 #               HARDWARE SETUP
@@ -139,35 +139,11 @@ def buzzer_worker():
             print(f"Buzzer Error: {e}")
 
 # ==========================================
-#           THREAD 4: RTC UPDATER (UNCHANGED)
+#           THREAD 4: RTC SYNC
 # ==========================================
 def rtc_worker():
-    global CURRENT_RTC_TIME
-    def bcd_to_dec(b): return (b // 16) * 10 + (b % 16)
-
-    try:
-        bus = smbus2.SMBus(I2C_BUS)
-    except:
-        return
-
-    while not STOP_THREADS:
-        try:
-            data = bus.read_i2c_block_data(DS3231_ADDRESS, 0x00, 7)
-            second = bcd_to_dec(data[0])
-            minute = bcd_to_dec(data[1])
-            hour = bcd_to_dec(data[2])
-            day = bcd_to_dec(data[4])
-            month = bcd_to_dec(data[5])
-            year = 2025 + bcd_to_dec(data[6])
-            
-            new_time = datetime(year, month, day, hour, minute, second)
-            with data_lock:
-                CURRENT_RTC_TIME = new_time
-        except Exception:
-            with data_lock:
-                CURRENT_RTC_TIME = datetime.now()
-        
-        time.sleep(1.0)
+    """Re-syncs the RTC clock every RTC_SYNC_INTERVAL seconds (see rtc_clock.py)."""
+    rtc_clock.run(lambda: STOP_THREADS)
 
 # ==========================================
 #      THREAD 5: MODE CHECKER (NEW)
@@ -197,13 +173,11 @@ def beep(duration=0.5):
     buzzer_queue.put(duration)
 
 def get_current_time():
-    with data_lock:
-        return CURRENT_RTC_TIME
+    return rtc_clock.now()
 
 def get_rtc_time_string():
-    """Formats the current RTC time for the backend"""
-    with data_lock:
-        return CURRENT_RTC_TIME.strftime("%Y-%m-%d %H:%M:%S")
+    """Formats the current RTC time for the backend (with milliseconds)"""
+    return rtc_clock.now_string()
 
 def consume_rfid_data():
     global LAST_SCANNED_ID
@@ -0,0 +1,197 @@
+import time
+import threading
+from datetime import datetime, timedelta
+
+import smbus2
+
+# ==========================================
+#       RTC CLOCK (DS3231 + MONOTONIC)
+# ==========================================
+# The DS3231 only counts whole seconds and every read is an I2C transaction.
+# Instead of polling it once per second, we sync every sync_interval seconds.
+# A sync catches the seconds register ticking over, which pins the RTC to the
+# exact start of a second, and pairs that with time.monotonic(). The previous
+# sync tells us where the next tick lands, so only a short burst of reads
+# around it is needed (the first sync also polls, with sleeps, to find it).
+# Between syncs, now() is pure arithmetic on the monotonic clock, so a card
+# tap never touches the I2C bus or a lock.
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+# Tight polling only covers this many seconds either side of a predicted tick
+EDGE_WINDOW = 0.015
+# Predicted ticks closer than this are skipped for the following one
+EDGE_LEAD = 0.05
+# Sleep between reads when the tick position is unknown (first sync)
+FALLBACK_POLL_INTERVAL = 0.005
+
+
+def bcd_to_dec(b):
+    return (b // 16) * 10 + (b % 16)
+
+
+class RTCClock:
+    def __init__(self, bus_number=1, address=0x68, sync_interval=600.0):
+        self.bus_number = bus_number
+        self.address = address
+        self.sync_interval = sync_interval
+
+        # (monotonic seconds, RTC datetime, rate) replaced as one tuple,
+        # so readers always see a consistent anchor without locking
+        self._anchor = None
+        self.source = "system"   # "rtc" once a sync has succeeded
+        self.drift_ppm = None    # RTC rate vs monotonic, after 2 syncs
+        self.last_sync = None    # monotonic time of the last good sync
+
+        self._bus = None
+        self._sync_lock = threading.Lock()
+
+    # --- I2C ---
+    def _read_rtc(self):
+        """Reads the DS3231 time registers (one I2C block read)."""
+        data = self._bus.read_i2c_block_data(self.address, 0x00, 7)
+        second = bcd_to_dec(data[0] & 0x7F)
+        minute = bcd_to_dec(data[1])
+        hour = bcd_to_dec(data[2] & 0x3F)
+        day = bcd_to_dec(data[4])
+        month = bcd_to_dec(data[5] & 0x1F)
+        year = 2025 + bcd_to_dec(data[6])
+        return datetime(year, month, day, hour, minute, second)
+
+    def _timed_read(self):
+        """One RTC read plus the monotonic midpoint of the transaction."""
+        before = time.monotonic()
+        value = self._read_rtc()
+        return (before + time.monotonic()) / 2, value
+
+    def _poll_edge(self, deadline, interval):
+        """
+        Reads the RTC every `interval` seconds until its seconds value
+        changes or `deadline` passes. The tick happened between the last
+        unchanged read and the first changed one, so we anchor halfway
+        between the two; the error is about half the polling gap.
+        Returns (monotonic, rtc_time), or None if no tick was seen.
+        """
+        previous_mid, previous = self._timed_read()
+        while time.monotonic() < deadline:
+            if interval:
+                time.sleep(interval)
+            current_mid, current = self._timed_read()
+            if current != previous:
+                return (previous_mid + current_mid) / 2, current
+            previous_mid = current_mid
+        return None
+
+    def _predict_tick(self, anchor):
+        """Monotonic time of the next RTC tick at least EDGE_LEAD away, from the last anchor."""
+        mono, _, rate = anchor
+        elapsed = (time.monotonic() + EDGE_LEAD - mono) * rate
+        return mono + (int(elapsed) + 1) / rate
+
+    def _poll_predicted(self, anchor):
+        """Sleeps until just before the next predicted tick, then polls back to back around it."""
+        tick = self._predict_tick(anchor)
+        time.sleep(max(0.0, tick - EDGE_WINDOW - time.monotonic()))
+        return self._poll_edge(tick + EDGE_WINDOW, 0)
+
+    def _read_second_edge(self):
+        """
+        Finds an RTC seconds tick and returns (monotonic, rtc_time) for it.
+        With a previous anchor we know where the tick will land: sleep until
+        just before it and poll back to back only inside a short window, a
+        few dozen reads per sync. On the first sync, or if the window is
+        missed, poll with a short sleep to find a tick roughly, then use that
+        to catch the following tick precisely.
+        """
+        anchor = self._anchor
+        if anchor is not None:
+            edge = self._poll_predicted(anchor)
+            if edge is not None:
+                return edge
+        coarse = self._poll_edge(time.monotonic() + 1.5, FALLBACK_POLL_INTERVAL)
+        if coarse is None:
+            raise TimeoutError("RTC seconds register did not advance")
+        mono, rtc_time = coarse
+        return self._poll_predicted((mono, rtc_time, 1.0)) or coarse
+
+    # --- SYNC ---
+    def sync(self):
+        """
+        Re-anchors the clock to the RTC. Returns True on success.
+        On failure the previous anchor is kept (or system time if we never
+        synced) and the reason is printed instead of being swallowed.
+        """
+        with self._sync_lock:
+            try:
+                if self._bus is None:
+                    self._bus = smbus2.SMBus(self.bus_number)
+                mono, rtc_time = self._read_second_edge()
+            except Exception as e:
+                print(f"[RTC] Sync failed, using {self.source} time: {e}")
+                return False
+
+            if self._anchor is not None:
+                prev_mono, prev_time, _ = self._anchor
+                elapsed_mono = mono - prev_mono
+                elapsed_rtc = (rtc_time - prev_time).total_seconds()
+                if elapsed_mono > 0:
+                    rate = elapsed_rtc / elapsed_mono
+                    self.drift_ppm = (rate - 1.0) * 1e6
+                    # Ignore nonsense (RTC was set, or bus glitch); keep 1.0
+                    if abs(self.drift_ppm) > 1000:
+                        print(f"[RTC] Clock jumped ({self.drift_ppm:.0f} ppm), resetting drift")
+                        self.drift_ppm = None
+                        rate = 1.0
+                else:
+                    rate = 1.0
+            else:
+                rate = 1.0
+
+            self._anchor = (mono, rtc_time, rate)
+            self.source = "rtc"
+            self.last_sync = mono
+            return True
+
+    # --- READING ---
+    def now(self):
+        """Current time from the last anchor + monotonic clock. No I2C, no lock."""
+        anchor = self._anchor
+        if anchor is None:
+            # Never synced with the RTC: system clock is the best we have
+            return datetime.now()
+        mono, wall, rate = anchor
+        return wall + timedelta(seconds=(time.monotonic() - mono) * rate)
+
+    def now_string(self):
+        """Current time formatted for the backend, with milliseconds."""
+        return self.now().strftime(TIME_FORMAT)[:-3]
+
+    def status(self):
+        """Snapshot for logging: source, drift and seconds since last sync."""
+        age = None
+        if self.last_sync is not None:
+            age = round(time.monotonic() - self.last_sync, 1)
+        drift = None if self.drift_ppm is None else round(self.drift_ppm, 2)
+        return {"source": self.source, "drift_ppm": drift, "last_sync_age": age}
+
+    # --- THREAD ---
+    def run(self, should_stop, retry_interval=10.0):
+        """
+        Worker loop: sync now, then every sync_interval seconds.
+        Failed syncs retry sooner, doubling the wait after each failure up to
+        sync_interval, so a board without an RTC doesn't flood the log.
+        should_stop() ends the loop.
+        """
+        next_sync = 0.0
+        retry_delay = retry_interval
+        while not should_stop():
+            if time.monotonic() >= next_sync:
+                if self.sync():
+                    print(f"[RTC] Synced: {self.status()}")
+                    next_sync = time.monotonic() + self.sync_interval
+                    retry_delay = retry_interval
+                else:
+                    print(f"[RTC] Retrying in {retry_delay:.0f} s")
+                    next_sync = time.monotonic() + retry_delay
+                    retry_delay = min(retry_delay * 2, self.sync_interval)
+            time.sleep(0.5)